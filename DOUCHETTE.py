@@ -5,6 +5,14 @@ import barcode
 from barcode.writer import ImageWriter
 import datetime
 import sqlite3
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 import win32print
@@ -13,8 +21,59 @@ import win32con
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 
+# --- COMMAND LINE ---
+def parse_vitesse(valeur):
+    if valeur == "max":
+        return math.inf
+    vitesse = float(valeur)
+    if not vitesse > 0:
+        raise argparse.ArgumentTypeError("La vitesse doit être positive ou 'max'.")
+    return vitesse
+
+def parse_attente_max(valeur):
+    attente = float(valeur)
+    if not attente >= 0:
+        raise argparse.ArgumentTypeError("L'attente maximale ne peut pas être négative.")
+    return attente
+
+parser = argparse.ArgumentParser(description="Étiquettes & Gestion de Stock")
+mode = parser.add_mutually_exclusive_group()
+mode.add_argument("--enregistrer", metavar="TRACE", help="Enregistrer les actions du poste dans un fichier trace (JSON Lines).")
+mode.add_argument("--rejouer", metavar="TRACE", help="Rejouer un fichier trace sans interface, sur une base de test.")
+parser.add_argument("--vitesse", type=parse_vitesse, help="Vitesse du rejeu: 1, 10 ou 'max' (défaut: 1).")
+parser.add_argument("--attente-max", metavar="MS", type=parse_attente_max,
+                    help="En rejeu, échouer si une action attend plus de MS millisecondes en file.")
+parser.add_argument("--base", help="Base SQLite à utiliser (défaut: etiquettes.db). En rejeu, le fichier ne doit pas exister.")
+parser.add_argument("--base-source", metavar="DB", help="Base copiée comme état initial de la base de rejeu.")
+args = parser.parse_args()
+
+if not args.rejouer:
+    for option, valeur in (("--vitesse", args.vitesse), ("--attente-max", args.attente_max),
+                           ("--base-source", args.base_source)):
+        if valeur is not None:
+            parser.error(f"{option} n'est utilisable qu'avec --rejouer.")
+
+if args.rejouer:
+    if args.vitesse is None:
+        args.vitesse = 1.0
+    if args.base and os.path.exists(args.base):
+        parser.error(f"La base de rejeu {args.base} existe déjà; indiquez un fichier qui n'existe pas.")
+    if args.base_source:
+        if not os.path.isfile(args.base_source):
+            parser.error(f"Base source introuvable: {args.base_source}")
+        if args.base and os.path.normcase(os.path.abspath(args.base_source)) == os.path.normcase(os.path.abspath(args.base)):
+            parser.error("--base et --base-source doivent désigner deux fichiers différents.")
+
+    # Le rejeu ne travaille que dans des fichiers qu'il crée lui-même
+    dossier_rejeu = tempfile.mkdtemp(prefix="rejeu_")
+    db_path = args.base or os.path.join(dossier_rejeu, "etiquettes.db")
+    if args.base_source:
+        shutil.copyfile(args.base_source, db_path)
+else:
+    db_path = args.base or "etiquettes.db"
+
 # --- DATABASE SETUP ---
-conn = sqlite3.connect("etiquettes.db")
+conn = sqlite3.connect(db_path)
 cursor = conn.cursor()
 
 # Create tables
@@ -74,8 +133,21 @@ COLORIS_MAPPING = {
 REVERSE_MODELE_MAPPING = {v: k for k, v in MODELE_MAPPING.items()}
 REVERSE_COLORIS_MAPPING = {v: k for k, v in COLORIS_MAPPING.items()}
 
+# --- TRACE ---
+trace_file = open(args.enregistrer, "a", encoding="utf-8", buffering=1) if args.enregistrer else None
+
+def enregistrer_trace(action, t=None, **donnees):
+    if trace_file is None:
+        return
+    if t is None:
+        t = time.time()
+    trace_file.write(json.dumps({"t": t, "action": action, **donnees}, ensure_ascii=False) + "\n")
+
+# La trace est ouverte en ajout: chaque lancement du poste commence une nouvelle session
+enregistrer_trace("session")
+
 # --- FUNCTIONS ---
-def generer_code_barre(modele, pointure, nb_paire, date_reception, of, coloris, display=True):
+def generer_code_barre(modele, pointure, nb_paire, date_reception, of, coloris, display=True, dossier="."):
     if not all([modele, pointure, nb_paire, date_reception, of, coloris]):
         if display:
             messagebox.showerror("Erreur 🚫", "Tous les champs sont obligatoires.")
@@ -114,7 +186,7 @@ def generer_code_barre(modele, pointure, nb_paire, date_reception, of, coloris,
 
     CODE128 = barcode.get_barcode_class('code128')
     code_barre = CODE128(code, writer=ImageWriter())
-    filename = code_barre.save(f"etiquette_code_{code}")
+    filename = code_barre.save(os.path.join(dossier, f"etiquette_code_{code}"))
 
     if display:
         img = Image.open(filename).resize((300, 100))
@@ -135,13 +207,49 @@ def generer_code_barre(modele, pointure, nb_paire, date_reception, of, coloris,
             messagebox.showerror("Erreur 🚫", f"Erreur lors de l'enregistrement en base: {e}")
         return None
 
+def generer_serie(modeles, coloris, pointures, nb_paire, of, date_reception, dossier=".", progression=None, codes=None):
+    bornes = pointures.split("-")
+    start = int(bornes[0])
+    end = int(bornes[1]) if len(bornes) > 1 else start
+    total = len(modeles) * (end - start + 1)
+    if codes is None:
+        codes = []
+    current = 0
+
+    for modele in modeles:
+        for pointure in range(start, end + 1):
+            result = generer_code_barre(modele, str(pointure), nb_paire, date_reception, of, coloris,
+                                        display=False, dossier=dossier)
+            if result:
+                codes.append(result)
+            current += 1
+            if progression:
+                progression(current, total)
+    return codes
+
+def generer_code_barre_saisi():
+    t = time.time()
+    donnees = dict(modele=entry_modele.get(), pointure=entry_pointure.get(), nb_paire=entry_nb_paire.get(),
+                   date_reception=entry_date.get(), of=entry_of.get(), coloris=entry_coloris.get())
+    result = generer_code_barre(**donnees)
+    enregistrer_trace("generation", t, ok=result is not None, **donnees)
+
 def imprimer_code_barre():
     if not hasattr(label_img_code, 'filename') or not code_var.get().strip():
         messagebox.showerror("Erreur 🚫", "Aucun code-barres généré.")
         return
 
+    code = code_var.get().strip()
+    t = time.time()
+    try:
+        dib = preparer_impression(code)
+    except Exception as e:
+        enregistrer_trace("impression", t, ok=False, codes=[code])
+        messagebox.showerror("Erreur 🚫", f"Erreur lors de l'impression: {e}")
+        return
+    enregistrer_trace("impression", t, ok=True, codes=[code])
+
     try:
-        img = Image.open(label_img_code.filename).convert('RGB')
         printer_name = win32print.GetDefaultPrinter()
         hprinter = win32print.OpenPrinter(printer_name)
         hdc = win32ui.CreateDC()
@@ -149,7 +257,6 @@ def imprimer_code_barre():
         hdc.StartDoc('Barcode Print')
         hdc.StartPage()
 
-        dib = ImageWin.Dib(img)
         printable_width = 300 * 2
         printable_height = 100 * 2
         dib.draw(hdc.GetHandleOutput(), (100, 100, 100 + printable_width, 100 + printable_height))
@@ -234,26 +341,28 @@ def generer_multi_codes():
                 messagebox.showerror("Erreur", "Sélectionnez au moins un modèle.")
                 return
 
+            t = time.time()
             coloris = coloris_combo.get()
-            pointures = pointures_entry.get().split("-")
+            pointures = pointures_entry.get()
             nb_paire = nb_paire_entry.get()
             of = of_entry.get()
             date = date_entry.get()
+            donnees = dict(modeles=selected_models, coloris=coloris, pointures=pointures,
+                           nb_paire=nb_paire, of=of, date_reception=date)
 
-            start = int(pointures[0])
-            end = int(pointures[1]) if len(pointures) > 1 else start
-            total = len(selected_models) * (end - start + 1)
-            progress["maximum"] = total
-            current = 0
-
-            for modele in selected_models:
-                for pointure in range(start, end + 1):
-                    result = generer_code_barre(modele, str(pointure), nb_paire, date, of, coloris, display=False)
-                    if result:
-                        generated_codes.append(result)
-                    current += 1
-                    progress["value"] = current
-                    dialog.update()
+            def avancer(current, total):
+                progress["maximum"] = total
+                progress["value"] = current
+                dialog.update()
+
+            # generated_codes se remplit au fil de la série et garde les codes déjà générés en cas d'erreur
+            try:
+                generer_serie(selected_models, coloris, pointures, nb_paire, of, date,
+                              progression=avancer, codes=generated_codes)
+            except Exception:
+                enregistrer_trace("generation_multiple", t, ok=False, **donnees)
+                raise
+            enregistrer_trace("generation_multiple", t, ok=bool(generated_codes), **donnees)
 
             print_btn.config(state=tk.NORMAL)
             messagebox.showinfo("Succès", f"{len(generated_codes)} codes-barres générés! Cliquez sur 'Imprimer' pour l'impression.")
@@ -265,6 +374,16 @@ def generer_multi_codes():
             messagebox.showerror("Erreur", "Aucun code à imprimer.")
             return
 
+        codes = [code_data['code'] for code_data in generated_codes]
+        t = time.time()
+        try:
+            dibs = [preparer_impression(code) for code in codes]
+        except Exception as e:
+            enregistrer_trace("impression", t, ok=False, codes=codes)
+            messagebox.showerror("Erreur", f"Échec de l'impression: {str(e)}")
+            return
+        enregistrer_trace("impression", t, ok=True, codes=codes)
+
         try:
             printer_name = win32print.GetDefaultPrinter()
             hprinter = win32print.OpenPrinter(printer_name)
@@ -277,14 +396,12 @@ def generer_multi_codes():
             y_pos = 100
             codes_per_page = 8
 
-            for i, code_data in enumerate(generated_codes):
+            for i, (code_data, dib) in enumerate(zip(generated_codes, dibs)):
                 if i > 0 and i % codes_per_page == 0:
                     hdc.EndPage()
                     hdc.StartPage()
                     y_pos = 100
 
-                img = Image.open(code_data['filename']).convert('RGB')
-                dib = ImageWin.Dib(img)
                 dib.draw(hdc.GetHandleOutput(), (x_pos, y_pos, x_pos + 250, y_pos + 80))
 
                 hdc.TextOut(x_pos, y_pos + 90, f"Mod: {code_data['modele']} Pt: {code_data['pointure']}")
@@ -370,33 +487,105 @@ def validate_code(code):
         raise ValueError(f"Code coloris invalide. Attendu: {list(REVERSE_COLORIS_MAPPING.keys())}.")
     return year, pointure, nb_paire, modele_code, coloris_code
 
-def ajouter_ligne_table(event=None):
-    code = scan_code_var.get().strip()
-    try:
-        year, pointure, nb_paire, modele_code, coloris_code = validate_code(code)
-        modele = REVERSE_MODELE_MAPPING[modele_code]
-        coloris = REVERSE_COLORIS_MAPPING[coloris_code]
-        date_rec = "2025-05-23"
-        of = "OF0001"
+def enregistrer_scan(code):
+    year, pointure, nb_paire, modele_code, coloris_code = validate_code(code)
+    modele = REVERSE_MODELE_MAPPING[modele_code]
+    coloris = REVERSE_COLORIS_MAPPING[coloris_code]
+    date_rec = "2025-05-23"
+    of = "OF0001"
 
+    cursor.execute('''
+        INSERT OR IGNORE INTO etiquettes (modele, pointure, nb_paire, date_reception, coloris, code, of)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (modele, pointure, nb_paire, date_rec, coloris, code, of))
+    conn.commit()
+    return modele, pointure, nb_paire, date_rec, coloris, code
+
+def enregistrer_stock(code, lieu_stockage, date_reception):
+    year, pointure, nb_paire, modele_code, coloris_code = validate_code(code)
+    designation = REVERSE_MODELE_MAPPING[modele_code]
+    coloris = REVERSE_COLORIS_MAPPING[coloris_code]
+    if not lieu_stockage or lieu_stockage not in ["Imbert-Mnif", "Decathlon"]:
+        raise ValueError("Lieu de stockage invalide.")
+    datetime.datetime.strptime(date_reception, "%Y-%m-%d")
+
+    cursor.execute('''
+        INSERT OR IGNORE INTO stock (code, designation, coloris, pointure, nb_paire, date_reception, lieu_stockage)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (code, designation, coloris, pointure, nb_paire, date_reception, lieu_stockage))
+    conn.commit()
+    return code, designation, coloris, pointure, nb_paire, date_reception, lieu_stockage
+
+def enregistrer_sortie(code, nb_paire, date_sortie):
+    year, pointure, _, modele_code, coloris_code = validate_code(code)
+    designation = REVERSE_MODELE_MAPPING[modele_code]
+    coloris = REVERSE_COLORIS_MAPPING[coloris_code]
+    int_nb_paire = int(nb_paire)
+    if int_nb_paire < 1:
+        raise ValueError("Nombre de paires doit être positif.")
+    datetime.datetime.strptime(date_sortie, "%Y-%m-%d")
+
+    cursor.execute('''
+        SELECT nb_paire FROM stock WHERE code = ? AND lieu_stockage = 'Decathlon'
+    ''', (code,))
+    result = cursor.fetchone()
+    if not result:
+        raise ValueError("Aucun stock trouvé pour ce code à Decathlon.")
+
+    current_stock = int(result[0])
+    if current_stock < int_nb_paire:
+        raise ValueError(f"Stock insuffisant à Decathlon: {current_stock} paires disponibles.")
+
+    new_stock = current_stock - int_nb_paire
+    if new_stock == 0:
         cursor.execute('''
-            INSERT OR IGNORE INTO etiquettes (modele, pointure, nb_paire, date_reception, coloris, code, of)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (modele, pointure, nb_paire, date_rec, coloris, code, of))
-        conn.commit()
+            DELETE FROM stock WHERE code = ? AND lieu_stockage = 'Decathlon'
+        ''', (code,))
+    else:
+        cursor.execute('''
+            UPDATE stock SET nb_paire = ? WHERE code = ? AND lieu_stockage = 'Decathlon'
+        ''', (str(new_stock), code))
+
+    cursor.execute('''
+        INSERT OR IGNORE INTO sorties (code, designation, coloris, pointure, nb_paire, date_sortie)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (code, designation, coloris, pointure, str(int_nb_paire), date_sortie))
+    conn.commit()
+    return code, designation, coloris, pointure, str(int_nb_paire), date_sortie
 
-        table.insert("", "end", values=(modele, pointure, nb_paire, date_rec, coloris, code))
-        scan_code_var.set("")
+def lire_stock():
+    cursor.execute("SELECT code, designation, coloris, pointure, nb_paire, date_reception, lieu_stockage FROM stock")
+    return cursor.fetchall()
+
+def preparer_impression(code, dossier="."):
+    img = Image.open(os.path.join(dossier, f"etiquette_code_{code}.png")).convert('RGB')
+    return ImageWin.Dib(img)
+
+def ajouter_ligne_table(event=None):
+    code = scan_code_var.get().strip()
+    t = time.time()
+    try:
+        ligne = enregistrer_scan(code)
     except Exception as e:
+        enregistrer_trace("scan", t, ok=False, code=code)
         messagebox.showerror("Erreur 🚫", f"Code invalide ou erreur: {e}")
+        return
+    enregistrer_trace("scan", t, ok=True, code=code)
+    table.insert("", "end", values=ligne)
+    scan_code_var.set("")
 
 def ajouter_ligne_stock_scan(event=None):
     code = stock_scan_code_var.get().strip()
+    t = time.time()
     try:
-        year, pointure, nb_paire, modele_code, coloris_code = validate_code(code)
-        designation = REVERSE_MODELE_MAPPING[modele_code]
-        coloris = REVERSE_COLORIS_MAPPING[coloris_code]
+        validate_code(code)
+    except Exception as e:
+        enregistrer_trace("scan_reception", t, ok=False, code=code)
+        messagebox.showerror("Erreur 🚫", f"Code invalide ou erreur: {e}")
+        return
+    enregistrer_trace("scan_reception", t, ok=True, code=code)
 
+    try:
         dialog = tk.Toplevel(root)
         dialog.title("Ajouter au Stock")
         dialog.geometry("300x200")
@@ -413,23 +602,18 @@ def ajouter_ligne_stock_scan(event=None):
         def submit():
             lieu_stockage = lieu_var.get()
             date_reception = date_entry.get().strip()
+            t = time.time()
+            donnees = dict(code=code, lieu_stockage=lieu_stockage, date_reception=date_reception)
             try:
-                if not lieu_stockage or lieu_stockage not in ["Imbert-Mnif", "Decathlon"]:
-                    raise ValueError("Lieu de stockage invalide.")
-                datetime.datetime.strptime(date_reception, "%Y-%m-%d")
-
-                cursor.execute('''
-                    INSERT OR IGNORE INTO stock (code, designation, coloris, pointure, nb_paire, date_reception, lieu_stockage)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (code, designation, coloris, pointure, nb_paire, date_reception, lieu_stockage))
-                conn.commit()
-
-                table_stock.insert("", "end", values=(
-                    code, designation, coloris, pointure, nb_paire, date_reception, lieu_stockage))
-                stock_scan_code_var.set("")
-                dialog.destroy()
+                ligne = enregistrer_stock(code, lieu_stockage, date_reception)
             except Exception as e:
+                enregistrer_trace("reception", t, ok=False, **donnees)
                 messagebox.showerror("Erreur 🚫", f"Erreur: {e}")
+                return
+            enregistrer_trace("reception", t, ok=True, **donnees)
+            table_stock.insert("", "end", values=ligne)
+            stock_scan_code_var.set("")
+            dialog.destroy()
 
         ttk.Button(dialog, text="Valider", command=submit, bootstyle=SUCCESS).pack(pady=10)
         dialog.transient(root)
@@ -441,11 +625,16 @@ def ajouter_ligne_stock_scan(event=None):
 
 def ajouter_ligne_sortie_scan(event=None):
     code = sortie_scan_code_var.get().strip()
+    t = time.time()
     try:
         year, pointure, nb_paire, modele_code, coloris_code = validate_code(code)
-        designation = REVERSE_MODELE_MAPPING[modele_code]
-        coloris = REVERSE_COLORIS_MAPPING[coloris_code]
+    except Exception as e:
+        enregistrer_trace("scan_sortie", t, ok=False, code=code)
+        messagebox.showerror("Erreur 🚫", f"Code invalide ou erreur: {e}")
+        return
+    enregistrer_trace("scan_sortie", t, ok=True, code=code)
 
+    try:
         dialog = tk.Toplevel(root)
         dialog.title("Ajouter à la Sortie")
         dialog.geometry("300x200")
@@ -461,53 +650,25 @@ def ajouter_ligne_sortie_scan(event=None):
         date_entry.insert(0, "2025-05-23")
 
         def submit():
+            nb_paire_sortie = nb_paire_entry.get().strip()
+            date_sortie = date_entry.get().strip()
+            t = time.time()
+            donnees = dict(code=code, nb_paire=nb_paire_sortie, date_sortie=date_sortie)
             try:
-                int_nb_paire = int(nb_paire_entry.get().strip())
-                date_sortie = date_entry.get().strip()
-                if int_nb_paire < 1:
-                    raise ValueError("Nombre de paires doit être positif.")
-                datetime.datetime.strptime(date_sortie, "%Y-%m-%d")
-
-                cursor.execute('''
-                    SELECT nb_paire FROM stock WHERE code = ? AND lieu_stockage = 'Decathlon'
-                ''', (code,))
-                result = cursor.fetchone()
-                if not result:
-                    raise ValueError("Aucun stock trouvé pour ce code à Decathlon.")
-
-                current_stock = int(result[0])
-                if current_stock < int_nb_paire:
-                    raise ValueError(f"Stock insuffisant à Decathlon: {current_stock} paires disponibles.")
-
-                new_stock = current_stock - int_nb_paire
-                if new_stock == 0:
-                    cursor.execute('''
-                        DELETE FROM stock WHERE code = ? AND lieu_stockage = 'Decathlon'
-                    ''', (code,))
-                else:
-                    cursor.execute('''
-                        UPDATE stock SET nb_paire = ? WHERE code = ? AND lieu_stockage = 'Decathlon'
-                    ''', (str(new_stock), code))
-
-                cursor.execute('''
-                    INSERT OR IGNORE INTO sorties (code, designation, coloris, pointure, nb_paire, date_sortie)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (code, designation, coloris, pointure, str(int_nb_paire), date_sortie))
-                conn.commit()
-
-                table_sorties.insert("", "end",
-                                     values=(code, designation, coloris, pointure, str(int_nb_paire), date_sortie))
-                sortie_scan_code_var.set("")
-                dialog.destroy()
-
-                for item in table_stock.get_children():
-                    table_stock.delete(item)
-                cursor.execute("SELECT code, designation, coloris, pointure, nb_paire, date_reception, lieu_stockage FROM stock")
-                for row in cursor.fetchall():
-                    table_stock.insert("", "end", values=row)
-
+                ligne = enregistrer_sortie(code, nb_paire_sortie, date_sortie)
             except Exception as e:
+                enregistrer_trace("sortie", t, ok=False, **donnees)
                 messagebox.showerror("Erreur 🚫", f"Erreur: {e}")
+                return
+            enregistrer_trace("sortie", t, ok=True, **donnees)
+            table_sorties.insert("", "end", values=ligne)
+            sortie_scan_code_var.set("")
+            dialog.destroy()
+
+            for item in table_stock.get_children():
+                table_stock.delete(item)
+            for row in lire_stock():
+                table_stock.insert("", "end", values=row)
 
         ttk.Button(dialog, text="Valider", command=submit, bootstyle=SUCCESS).pack(pady=10)
         dialog.transient(root)
@@ -534,6 +695,175 @@ def charger_donnees_db():
     for row in cursor.fetchall():
         table_sorties.insert("", "end", values=row)
 
+# --- REPLAY ---
+ACTIONS_TRACE = ("session", "scan", "scan_reception", "reception", "scan_sortie", "sortie",
+                 "generation", "generation_multiple", "impression")
+
+def executer_action(action):
+    nom = action["action"]
+    if nom == "scan":
+        enregistrer_scan(action["code"])
+    elif nom in ("scan_reception", "scan_sortie"):
+        validate_code(action["code"])
+    elif nom == "reception":
+        enregistrer_stock(action["code"], action["lieu_stockage"], action["date_reception"])
+    elif nom == "sortie":
+        enregistrer_sortie(action["code"], action["nb_paire"], action["date_sortie"])
+        lire_stock()
+    elif nom == "generation":
+        result = generer_code_barre(action["modele"], action["pointure"], action["nb_paire"],
+                                    action["date_reception"], action["of"], action["coloris"],
+                                    display=False, dossier=dossier_rejeu)
+        if not result:
+            raise ValueError("Génération refusée (champs invalides).")
+    elif nom == "generation_multiple":
+        codes = generer_serie(action["modeles"], action["coloris"], action["pointures"], action["nb_paire"],
+                              action["of"], action["date_reception"], dossier=dossier_rejeu)
+        if not codes:
+            raise ValueError("Aucun code généré (champs invalides).")
+    elif nom == "impression":
+        for code in action["codes"]:
+            preparer_impression(code, dossier_rejeu)
+    else:
+        raise ValueError(f"Action inconnue: {nom}")
+
+def decrire_action(action):
+    if action["action"] == "generation":
+        champs = [action.get("modele"), action.get("pointure"), action.get("coloris")]
+    elif action["action"] == "generation_multiple":
+        champs = [", ".join(map(str, action.get("modeles") or [])), action.get("pointures"), action.get("coloris")]
+    elif action["action"] == "impression":
+        champs = [", ".join(map(str, action.get("codes") or []))]
+    else:
+        champs = [action.get("code")]
+    return " ".join(str(champ) for champ in champs if champ)
+
+def percentile(valeurs, p):
+    if not valeurs:
+        return 0.0
+    valeurs = sorted(valeurs)
+    return valeurs[max(0, math.ceil(p / 100 * len(valeurs)) - 1)]
+
+def lire_trace(trace_path):
+    actions = []
+    ignorees = []
+    t_precedent = None
+    with open(trace_path, encoding="utf-8") as f:
+        for numero, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                action = json.loads(line)
+                if not isinstance(action, dict) or "action" not in action:
+                    raise ValueError("champ 'action' manquant")
+                if not isinstance(action["action"], str) or action["action"] not in ACTIONS_TRACE:
+                    raise ValueError(f"action inconnue: {action['action']!r}")
+                if not isinstance(action.get("t"), (int, float)):
+                    raise ValueError("horodatage 't' manquant ou invalide")
+                if not isinstance(action.get("ok", True), bool):
+                    raise ValueError("champ 'ok' invalide")
+                if action["action"] != "session" and t_precedent is not None and action["t"] < t_precedent:
+                    raise ValueError("horodatage antérieur à la ligne précédente")
+            except ValueError as e:
+                ignorees.append((numero, e))
+                continue
+            t_precedent = action["t"]
+            actions.append(action)
+    return actions, ignorees
+
+def rejouer_trace(actions, vitesse):
+    services = {}
+    attentes = {}
+    echecs_attendus = []
+    ecarts = []
+    en_file = []
+    nb_sessions = 0
+    debut = time.perf_counter()
+    origine = None
+    for action in actions:
+        if action["action"] == "session" or origine is None:
+            # Chaque session repart de zéro: l'intervalle entre deux sessions n'est pas rejoué
+            origine = (time.perf_counter(), action["t"])
+            fin_precedente = origine[0]
+            nb_sessions += 1
+            if action["action"] == "session":
+                continue
+        attente = 0.0
+        if vitesse != math.inf:
+            arrivee = origine[0] + (action["t"] - origine[1]) / vitesse
+            if fin_precedente > arrivee:
+                # Tk met en file les frappes reçues pendant le traitement précédent
+                attente = fin_precedente - arrivee
+                en_file.append((action, attente))
+            else:
+                time.sleep(max(0.0, arrivee - time.perf_counter()))
+        demarrage = time.perf_counter()
+        erreur = None
+        try:
+            executer_action(action)
+        except KeyError as e:
+            erreur = ValueError(f"champ {e} manquant dans la trace")
+        except Exception as e:
+            erreur = e
+        fin_precedente = time.perf_counter()
+        # Les traces sans champ 'ok' attendent un succès
+        if action.get("ok", True) != (erreur is None):
+            ecarts.append((action, erreur or "réussie alors qu'elle avait échoué à l'enregistrement"))
+        elif erreur is not None:
+            echecs_attendus.append((action, erreur))
+        services.setdefault(action["action"], []).append(fin_precedente - demarrage)
+        attentes.setdefault(action["action"], []).append(attente)
+    duree = time.perf_counter() - debut
+
+    return {'nb_actions': sum(len(valeurs) for valeurs in services.values()), 'nb_sessions': nb_sessions,
+            'duree': duree, 'services': services, 'attentes': attentes,
+            'echecs_attendus': echecs_attendus, 'ecarts': ecarts, 'en_file': en_file}
+
+def afficher_percentiles(titre, mesures):
+    toutes = [m for valeurs in mesures.values() for m in valeurs]
+    print(titre)
+    print(f"{'Action':<22}{'Nb':>6}{'p50 ms':>10}{'p90 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for nom, valeurs in sorted(mesures.items()) + [("total", toutes)]:
+        print(f"{nom:<22}{len(valeurs):>6}"
+              + "".join(f"{percentile(valeurs, p) * 1000:>10.1f}" for p in (50, 90, 95, 99, 100)))
+
+def afficher_rapport(trace_path, vitesse, rapport, ignorees):
+    nb_actions = rapport['nb_actions']
+    debit = nb_actions / rapport['duree'] if rapport['duree'] > 0 else 0.0
+    print(f"Rejeu de {trace_path} (vitesse {'max' if vitesse == math.inf else f'{vitesse:g}x'}) sur {db_path}, images dans {dossier_rejeu}")
+    print(f"{nb_actions} actions ({rapport['nb_sessions']} sessions) en {rapport['duree']:.2f} s, débit {debit:.1f} actions/s")
+    if ignorees:
+        print(f"Lignes ignorées dans la trace: {len(ignorees)}")
+        for numero, e in ignorees:
+            print(f"  - ligne {numero}: {e}")
+    afficher_percentiles("Temps de traitement:", rapport['services'])
+    afficher_percentiles("Attente en file:", rapport['attentes'])
+    print(f"Échecs identiques à l'enregistrement: {len(rapport['echecs_attendus'])}")
+    for action, e in rapport['echecs_attendus']:
+        print(f"  - {action['action']} {decrire_action(action)}: {e}")
+    print(f"Écarts avec l'enregistrement: {len(rapport['ecarts'])}")
+    for action, e in rapport['ecarts']:
+        print(f"  - {action['action']} {decrire_action(action)}: {e}")
+    print(f"Actions mises en file (arrivées pendant le traitement précédent): {len(rapport['en_file'])}")
+    for action, attente in rapport['en_file']:
+        print(f"  - {action['action']} {decrire_action(action)}: attente {attente * 1000:.1f} ms")
+
+if args.rejouer:
+    try:
+        actions, ignorees = lire_trace(args.rejouer)
+    except (OSError, UnicodeDecodeError) as e:
+        parser.error(f"Impossible de lire la trace {args.rejouer}: {e}")
+    if not actions:
+        parser.error(f"Aucune action valide dans la trace {args.rejouer} ({len(ignorees)} lignes ignorées).")
+    rapport = rejouer_trace(actions, args.vitesse)
+    afficher_rapport(args.rejouer, args.vitesse, rapport, ignorees)
+    conn.close()
+    attente_max = max((attente for _, attente in rapport['en_file']), default=0.0) * 1000
+    depassement = args.attente_max is not None and attente_max > args.attente_max
+    if depassement:
+        print(f"Attente maximale {attente_max:.1f} ms au-delà du seuil de {args.attente_max:g} ms.")
+    sys.exit(1 if rapport['ecarts'] or depassement else 0)
+
 # --- INTERFACE ---
 root = ttk.Window(themename="flatly")
 root.title("Étiquettes & Gestion de Stock 🏷️")
@@ -562,8 +892,7 @@ for i, label in enumerate(labels):
 
 entry_modele, entry_pointure, entry_nb_paire, entry_date, entry_of, entry_coloris = entries
 
-ttk.Button(frame_gen, text="Générer Code-Barres 🏷️", command=lambda: generer_code_barre(
-    entry_modele.get(), entry_pointure.get(), entry_nb_paire.get(), entry_date.get(), entry_of.get(), entry_coloris.get())).grid(row=6, column=0, pady=15)
+ttk.Button(frame_gen, text="Générer Code-Barres 🏷️", command=generer_code_barre_saisi).grid(row=6, column=0, pady=15)
 ttk.Button(frame_gen, text="Imprimer Code-Barres 🖨️", command=imprimer_code_barre, bootstyle=PRIMARY).grid(row=6, column=1, pady=15)
 ttk.Button(frame_gen, text="Sauvegarder en PDF 📁", command=generer_pdf, bootstyle=INFO).grid(row=6, column=2, pady=15)
 
@@ -654,4 +983,6 @@ scrollbar_sorties.pack(side="right", fill="y", padx=(0, 10))
 charger_donnees_db()
 
 root.mainloop()
-conn.close()
\ No newline at end of file
+conn.close()
+if trace_file is not None:
+    trace_file.close()
\ No newline at end of file